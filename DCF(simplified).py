@@ -3,6 +3,9 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
+from profiling import profiler
+from dcf_engine import value_companies
+from cost_of_capital import compute_wacc
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'DejaVu Sans']  # 用来正常显示中文标签
@@ -14,30 +17,55 @@ print("=== 简化版DCF估值分析 ===")
 company_name = input("请输入公司名称: ")
 current_revenue = float(input("请输入当前年度收入 (百万美元): "))
 #年度收入决定了未来现金流的基数（简化估计）
-#current_ebitda = float(input("请输入当前年度EBITDA (百万美元): "))
-#M = float(input("请输入五年后预期退出倍数: "))
-#提供另一种终值算法——EBITDA&退出倍数
-#M和EBITDA决定了终值
-forecast_years = 5 #详细预测期——五年
+base_year = int(input("请输入基准年份 (如2024): "))
+#详细预测期，至少1年
+while True:
+    forecast_years = int(input("请输入详细预测期年数 (如5): "))
+    if forecast_years >= 1:
+        break
+    print("错误：详细预测期至少为1年")
 print(f"您选择的公司是: {company_name},详细预测期为{forecast_years}年")
-#wacc= Rf + Beta * (Rm - Rf), 可由CAPM模型自行计算
-wacc = float(input("请输入加权平均资本成本WACC (百分比): ")) / 100
+#wacc可直接输入，或由CAPM得到股权成本 Re = Rf + Beta * (Rm - Rf) 后按资本结构计算
+wacc_input = input("请输入加权平均资本成本WACC (百分比)，直接回车则由CAPM计算: ").strip()
+if wacc_input:
+    wacc = float(wacc_input) / 100
+else:
+    beta = float(input("请输入股票的Beta值 (可由CAPM模型回归得到): "))
+    risk_free_rate = float(input("请输入无风险利率 (百分比): ")) / 100
+    market_return = float(input("请输入市场预期收益率 (百分比): ")) / 100
+    cost_of_debt = float(input("请输入税前债务成本 (百分比): ")) / 100
+    tax_rate = float(input("请输入所得税率 (百分比): ")) / 100
+    equity_market_value = float(input("请输入股权市值 (百万美元): "))
+    debt_market_value = float(input("请输入债务市值 (百万美元): "))
+    capital = compute_wacc(beta, risk_free_rate, market_return, cost_of_debt, tax_rate,
+                           equity_market_value, debt_market_value)
+    wacc = capital.wacc[0]
+    print(f"股权成本: {capital.cost_of_equity[0]*100:.2f}%, WACC: {wacc*100:.2f}%")
 growth_rate = float(input("请输入现金流长期增长率 (百分比): ")) / 100
-if growth_rate >= wacc:
-    print("警告: 长期增长率应低于WACC，否则估值无意义!请采用EBITDA&退出倍数计算终值")
+#终值算法：戈登增长模型，或EBITDA&退出倍数（M和EBITDA决定了终值）
+terminal_choice = input("请选择终值算法：1.戈登增长模型 2.EBITDA&退出倍数: ").strip()
+if terminal_choice != '2' and growth_rate >= wacc:
+    print("警告: 长期增长率应低于WACC，否则估值无意义!已改用EBITDA&退出倍数计算终值")
+    terminal_choice = '2'
+if terminal_choice == '2':
+    terminal_method = 'exit_multiple'
+    current_ebitda = float(input("请输入当前年度EBITDA (百万美元): "))
+    M = float(input(f"请输入{forecast_years}年后预期退出倍数: "))
+else:
+    terminal_method = 'gordon'
+    current_ebitda = M = None
+mid_year = input("是否采用年中折现 (yes/no): ").strip() == 'yes'
 net_debt = float(input("请输入净债务 (百万美元): "))  # 净债务 = 总债务 - 现金
-# 生成预测数据
-years = list(range(2025, 2025 + forecast_years))
 #获取预期增长率
 while True:
     try:
-        growth_input = input("请输入未来五年详细预期股权自由现金流增长率: ").strip()
+        growth_input = input(f"请输入未来{forecast_years}年详细预期股权自由现金流增长率: ").strip()
         # 分割输入并转换为浮点数
         revenue_growth = [float(x) for x in growth_input.split()]
         
         # 验证输入
-        if len(revenue_growth) != 5:
-            print("错误：请输入恰好5个数值")
+        if len(revenue_growth) != forecast_years:
+            print(f"错误：请输入恰好{forecast_years}个数值")
             continue
             
         # 验证数值范围（假设增长率在-100%到+100%之间是合理的）
@@ -54,34 +82,31 @@ while True:
         print(f"输入错误: {e}")
 
 # 计算自由现金流 (简化计算)
-fcf_list = []
 RATE = float(input("请输入假设的自由现金流与收入比值(百分比): ")) / 100
 current_fcf = current_revenue * RATE  # 假设FCF利润率为输入值RATE
+equity_amount = float(input("请输入总股本 (百万股): "))  # 总股本
 
-for i, year in enumerate(years):
-    fcf = current_fcf * (1 + revenue_growth[i])
-    fcf_list.append(fcf)
-    current_fcf = fcf
+# 预测、折现、终值与汇总由DCF引擎一次性完成
+result = value_companies(
+    current_fcf, revenue_growth, wacc, growth_rate,
+    terminal_method=terminal_method, current_ebitda=current_ebitda, exit_multiple=M,
+    mid_year=mid_year, net_debt=net_debt, shares=equity_amount, base_year=base_year
+)
+fcf_list = result.fcf[0]
+terminal_value = result.terminal_value[0]
+pv_terminal = result.pv_terminal[0]
+equity_value = result.equity_value[0]
+enterprise_value = result.enterprise_value[0]  # 加上净债务
+value_per_share = result.value_per_share[0]    # 除以总股本
 
 # 创建DataFrame
-df = pd.DataFrame({
-    'Year': years,
-    'Revenue_Growth': revenue_growth,
-    'FCF': fcf_list
-})
-
-# 计算现值
-df['PV_FCF'] = df['FCF'] / ((1 + wacc) ** (df['Year'] - 2024))
-
-# 计算终值 TV = FCF_n * (1 + g) / (WACC - g)
-terminal_value = fcf_list[-1] * (1 + growth_rate) / (wacc - growth_rate)
-pv_terminal = terminal_value /( (1 + wacc) ** forecast_years)
-
-# 计算总价值
-equity_amount = float(input("请输入总股本 (百万股): "))  # 总股本
-equity_value = df['PV_FCF'].sum() + pv_terminal
-enterprise_value = equity_value + net_debt  # 减去净债务
-value_per_share = equity_value / equity_amount    # 除以总股本
+with profiler.stage('DCF简化版.创建DataFrame'):
+    df = pd.DataFrame({
+        'Year': result.years,
+        'Revenue_Growth': revenue_growth,
+        'FCF': fcf_list,
+        'PV_FCF': result.pv_fcf[0]
+    })
 
 print("\n财务预测:")
 print(df.round(2))
@@ -92,19 +117,20 @@ print(f"股权价值: ${equity_value:,.2f}M")
 print(f"每股价值: ${value_per_share:.2f}")
 
 # 简单可视化
-plt.figure(figsize=(10, 6))
-plt.subplot(1, 2, 1)
-plt.bar(df['Year'], df['FCF'], color='lightblue')
-plt.title('自由现金流预测')
-plt.ylabel('FCF ($M)')
+with profiler.stage('DCF简化版.可视化'):
+    plt.figure(figsize=(10, 6))
+    plt.subplot(1, 2, 1)
+    plt.bar(df['Year'], df['FCF'], color='lightblue')
+    plt.title('自由现金流预测')
+    plt.ylabel('FCF ($M)')
 
-plt.subplot(1, 2, 2)
-components = [df['PV_FCF'].sum(), pv_terminal]
-labels = ['预测期现金流', '终值']
-plt.pie(components, labels=labels, autopct='%1.1f%%')
-plt.title('估值构成')
+    plt.subplot(1, 2, 2)
+    components = [df['PV_FCF'].sum(), pv_terminal]
+    labels = ['预测期现金流', '终值']
+    plt.pie(components, labels=labels, autopct='%1.1f%%')
+    plt.title('估值构成')
 
-plt.tight_layout()
-plt.show()
+    plt.tight_layout()
+    plt.show()
 
 print("\n分析完成! ✅")
\ No newline at end of file
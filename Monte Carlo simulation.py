@@ -5,6 +5,9 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 import warnings
+from dataclasses import dataclass
+from typing import Optional
+from profiling import profiler
 warnings.filterwarnings('ignore')
 
 # 设置中文字体
@@ -13,9 +16,110 @@ plt.rcParams['axes.unicode_minus'] = False
 
 print("=== 投资组合蒙特卡罗模拟分析 ===")
 
+# float32路径模式的精度界：价格路径由float64的对数收益率累加后只在取指数、乘初始投资时各舍入一次，
+# 相对float64结果的误差约为 2 * 2^-24 ≈ 1.2e-7，这里留出余量取1e-6；float32模式运行前会用 check_float32_precision 验证
+FLOAT32_REL_TOL = 1e-6
+# float32能表示的最大值的对数（约88.7），对数价值超过它时float32会溢出为inf，需改用float64
+FLOAT32_LOG_MAX = float(np.log(np.finfo(np.float32).max))
+
+# 分批模拟时每批随机收益率矩阵的元素个数上限（float64约1MB），避免一次生成 模拟次数×年数 的大矩阵
+CHUNK_ELEMENTS = 2**17
+
+# 统计指标与敏感性分析结果的结构化数组类型
+STATS_DTYPE = np.dtype([
+    ('mean_final', 'f8'), ('median_final', 'f8'), ('std_final', 'f8'),
+    ('min_final', 'f8'), ('max_final', 'f8'),
+    ('mean_return', 'f8'), ('annualized_return', 'f8'),
+    ('prob_loss', 'f8'), ('var_95', 'f8'), ('var_99', 'f8'),
+    ('ci_90_low', 'f8'), ('ci_90_high', 'f8'), ('ci_95_low', 'f8'), ('ci_95_high', 'f8'),
+])
+SENSITIVITY_DTYPE = np.dtype([
+    ('volatility', 'f8'), ('mean_value', 'f8'), ('std_value', 'f8'), ('prob_loss', 'f8'),
+])
+
+
+@dataclass(slots=True)
+class SimulationResult:
+    """一次模拟的结果记录：最终价值、（可选的）全部路径和统计指标"""
+    final_values: np.ndarray
+    paths: Optional[np.ndarray] = None
+    mean_final: float = np.nan
+    median_final: float = np.nan
+    std_final: float = np.nan
+    min_final: float = np.nan
+    max_final: float = np.nan
+    mean_return: float = np.nan
+    annualized_return: float = np.nan
+    prob_loss: float = np.nan
+    var_95: float = np.nan
+    var_99: float = np.nan
+    ci_90_low: float = np.nan
+    ci_90_high: float = np.nan
+    ci_95_low: float = np.nan
+    ci_95_high: float = np.nan
+
+    def to_record(self):
+        """把统计指标打包为一条结构化数组记录"""
+        return np.array(tuple(getattr(self, name) for name in STATS_DTYPE.names), dtype=STATS_DTYPE)
+
+    @property
+    def nbytes(self):
+        """结果占用的数组内存（字节）"""
+        nbytes = self.final_values.nbytes + STATS_DTYPE.itemsize
+        if self.paths is not None:
+            nbytes += self.paths.nbytes
+        return nbytes
+
+    def save(self, path):
+        """保存为npz文件，数组保持原有精度（float32模式下体积约减半）"""
+        arrays = {'stats': self.to_record(), 'final_values': self.final_values}
+        if self.paths is not None:
+            arrays['paths'] = self.paths
+        np.savez(path, **arrays)
+
+
+def _result_property(name):
+    """把 self.results 上的字段以只读属性暴露在模拟器上，兼容旧的属性访问方式"""
+    def getter(self):
+        if self.results is None:
+            raise AttributeError(f"尚未运行模拟，没有 {name} 结果")
+        return getattr(self.results, name)
+    return property(getter)
+
+
 class PortfolioMonteCarlo:
-    def __init__(self):
-        self.simulation_results = {}
+    # 旧版直接挂在实例上的结果属性，现转发到 self.results（all_paths 对应 results.paths）
+    final_values = _result_property('final_values')
+    all_paths = _result_property('paths')
+    mean_final = _result_property('mean_final')
+    median_final = _result_property('median_final')
+    std_final = _result_property('std_final')
+    min_final = _result_property('min_final')
+    max_final = _result_property('max_final')
+    mean_return = _result_property('mean_return')
+    annualized_return = _result_property('annualized_return')
+    prob_loss = _result_property('prob_loss')
+    var_95 = _result_property('var_95')
+    var_99 = _result_property('var_99')
+    ci_90_low = _result_property('ci_90_low')
+    ci_90_high = _result_property('ci_90_high')
+    ci_95_low = _result_property('ci_95_low')
+    ci_95_high = _result_property('ci_95_high')
+    
+    @property
+    def simulation_results(self):
+        """完整的结果记录（SimulationResult），运行模拟前为 None"""
+        return self.results
+    
+    def __init__(self, dtype=np.float64, store_paths=True):
+        # dtype=np.float32 时路径与最终价值以单精度保存，内存减半，精度界见 FLOAT32_REL_TOL
+        # store_paths=False 时不保存路径，只保留最终价值与统计指标
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("dtype 只能为 np.float32 或 np.float64")
+        self.store_paths = store_paths
+        self.results = None
+        self.sensitivity_results = None
         
     def get_user_inputs(self):
         """获取用户输入参数"""
@@ -26,12 +130,22 @@ class PortfolioMonteCarlo:
         self.years = int(input("请输入投资年限 (年): "))
         self.num_simulations = int(input("请输入模拟次数 (建议1000-10000): "))
         
+        # 存储模式：精简模式内存约减半，仅统计模式不保存路径（路径图不显示）
+        mode = input("请选择结果存储模式：1.完整(float64) 2.精简(float32) 3.仅统计(不保存路径) [默认1]: ").strip()
+        if mode == '2':
+            self.dtype, self.store_paths = np.dtype(np.float32), True
+        elif mode == '3':
+            self.dtype, self.store_paths = np.dtype(np.float64), False
+        else:
+            self.dtype, self.store_paths = np.dtype(np.float64), True
+        
         # 验证输入合理性
         if self.volatility <= 0:
             print("警告: 波动率应为正数")
         if self.num_simulations < 100:
             print("警告: 模拟次数过少，结果可能不准确")
     
+    @profiler.profile('PortfolioMonteCarlo.run_simulation')
     def run_simulation(self):
         """运行蒙特卡罗模拟"""
         print(f"\n正在运行 {self.num_simulations} 次蒙特卡罗模拟...")
@@ -39,63 +153,129 @@ class PortfolioMonteCarlo:
         #可填入随机种子以复现结果
         np.random.seed()
         
-        # 初始化结果数组
-        self.final_values = np.zeros(self.num_simulations)
-        self.all_paths = np.zeros((self.num_simulations, self.years + 1))
-        self.all_paths[:, 0] = self.initial_investment
+        n_sims, years = self.num_simulations, self.years
+        dtype = self.dtype
+        if dtype == np.float32:
+            dtype = self._checked_float32()
+        final_values = np.empty(n_sims, dtype=dtype)
+        paths = np.empty((n_sims, years + 1), dtype=dtype) if self.store_paths else None
         
-        # 运行模拟
-        for i in range(self.num_simulations):
+        # 分批模拟：每批只生成一小块随机收益率，累加、取指数都原地写入结果数组，峰值内存接近结果本身
+        chunk = max(1, CHUNK_ELEMENTS // max(years, 1))
+        for start in range(0, n_sims, chunk):
+            stop = min(start + chunk, n_sims)
             # 生成随机收益率路径（BSM推出的对数正态分布）
-            random_returns = np.random.normal(
-                self.annual_return - 0.5 * self.volatility**2, 
-                self.volatility, 
-                self.years
-            )
-            
-            # 计算投资价值路径
-            path = [self.initial_investment]
-            current_value = self.initial_investment
-            
-            for ret in random_returns:
-                current_value *= np.exp(ret)
-                path.append(current_value)
+            with profiler.stage('run_simulation.random_generation'):
+                random_returns = np.random.normal(
+                    self.annual_return - 0.5 * self.volatility**2, 
+                    self.volatility, 
+                    (stop - start, years)
+                )
             
-            self.all_paths[i] = path
-            self.final_values[i] = current_value
+            # 计算投资价值路径：累加对数收益率后取指数
+            with profiler.stage('run_simulation.path_building'):
+                if paths is None:
+                    log_values = random_returns.sum(axis=1)
+                else:
+                    log_values = np.cumsum(random_returns, axis=1, out=random_returns)
+                
+                # float32会溢出时整体改用float64，已完成的批次直接升精度
+                if final_values.dtype == np.float32 and not self._fits_float32(log_values):
+                    print("警告: 模拟价值超出float32可表示范围，已改用float64保存结果")
+                    final_values = final_values.astype(np.float64)
+                    if paths is not None:
+                        paths = paths.astype(np.float64)
+                
+                self._write_values(
+                    log_values,
+                    None if paths is None else paths[start:stop],
+                    final_values[start:stop]
+                )
+        
+        self.results = SimulationResult(final_values=final_values, paths=paths)
         
         # 计算关键统计指标
         self.calculate_statistics()
         
         print("模拟完成!")
     
+    def _fits_float32(self, log_values):
+        """对数收益率累计值换算成价值后是否仍在float32可表示范围内"""
+        if self.initial_investment <= 0:
+            return True
+        return np.max(log_values) + np.log(self.initial_investment) < FLOAT32_LOG_MAX
+    
+    def _write_values(self, log_values, paths_out, final_out):
+        """把一批累计对数收益率换算为价值写入给定数组：paths_out 为 None 时 log_values 为每次模拟的总对数收益率"""
+        if paths_out is None:
+            final_out[:] = self.initial_investment * np.exp(log_values)
+            return
+        
+        paths_out[:, 0] = self.initial_investment
+        np.exp(log_values, out=paths_out[:, 1:])
+        paths_out[:, 1:] *= paths_out.dtype.type(self.initial_investment)
+        final_out[:] = paths_out[:, -1]
+    
+    def _checked_float32(self):
+        """float32模式运行前先做精度检查，不满足精度界（含溢出）时退回float64"""
+        try:
+            max_rel_error = self.check_float32_precision(num_simulations=min(1000, self.num_simulations))
+        except AssertionError as e:
+            print(f"警告: {e}，已改用float64")
+            return np.dtype(np.float64)
+        print(f"float32精度检查通过: 最大相对误差 {max_rel_error:.2e} (精度界 {FLOAT32_REL_TOL:.0e})")
+        return np.dtype(np.float32)
+    
+    def check_float32_precision(self, num_simulations=1000, seed=0):
+        """用同一组随机数分别按float32和float64生成路径，返回最大相对误差并检查是否在精度界内（float32模式下 run_simulation 会自动调用）"""
+        rng = np.random.RandomState(seed)
+        random_returns = rng.normal(
+            self.annual_return - 0.5 * self.volatility**2, 
+            self.volatility, 
+            (num_simulations, self.years)
+        )
+        log_paths = np.cumsum(random_returns, axis=1)
+        paths_64 = np.empty((num_simulations, self.years + 1), dtype=np.float64)
+        paths_32 = np.empty((num_simulations, self.years + 1), dtype=np.float32)
+        with np.errstate(over='ignore', invalid='ignore'):
+            self._write_values(log_paths, paths_64, np.empty(num_simulations))
+            self._write_values(log_paths, paths_32, np.empty(num_simulations, dtype=np.float32))
+            rel_error = np.abs(paths_32 - paths_64) / paths_64
+        # 溢出产生的inf/nan同样视为超出精度界
+        max_rel_error = float(np.max(rel_error)) if np.all(np.isfinite(rel_error)) else np.inf
+        if max_rel_error > FLOAT32_REL_TOL:
+            raise AssertionError(f"float32路径相对误差 {max_rel_error:.2e} 超出精度界 {FLOAT32_REL_TOL:.0e}")
+        return max_rel_error
+    
+    @profiler.profile('PortfolioMonteCarlo.calculate_statistics')
     def calculate_statistics(self):
         """计算统计指标"""
-        # 最终价值统计
-        self.mean_final = np.mean(self.final_values)
-        self.median_final = np.median(self.final_values)
-        self.std_final = np.std(self.final_values)
-        self.min_final = np.min(self.final_values)
-        self.max_final = np.max(self.final_values)
+        r = self.results
+        final_values = r.final_values
+        
+        # 最终价值统计（float32模式下用float64累加，避免均值、标准差损失精度）
+        r.mean_final = float(np.mean(final_values, dtype=np.float64))
+        r.median_final = float(np.median(final_values))
+        r.std_final = float(np.std(final_values, dtype=np.float64))
+        r.min_final = float(np.min(final_values))
+        r.max_final = float(np.max(final_values))
         
         # 收益率统计
-        total_returns = (self.final_values - self.initial_investment) / self.initial_investment
-        self.mean_return = np.mean(total_returns)
-        self.annualized_return = (1 + self.mean_return) ** (1/self.years) - 1
+        r.mean_return = (r.mean_final - self.initial_investment) / self.initial_investment
+        r.annualized_return = (1 + r.mean_return) ** (1/self.years) - 1
         
         # 风险指标
-        self.prob_loss = np.sum(self.final_values < self.initial_investment) / self.num_simulations
-        self.var_95 = np.percentile(self.final_values, 5)  # 95%置信水平的VaR
-        self.var_99 = np.percentile(self.final_values, 1)  # 99%置信水平的VaR
+        r.prob_loss = np.sum(final_values < self.initial_investment) / self.num_simulations
+        r.var_95, r.var_99 = np.percentile(final_values, [5, 1])  # 95%/99%置信水平的VaR
         
         # 置信区间
-        self.ci_90_low = np.percentile(self.final_values, 5)
-        self.ci_90_high = np.percentile(self.final_values, 95)
-        self.ci_95_low = np.percentile(self.final_values, 2.5)
-        self.ci_95_high = np.percentile(self.final_values, 97.5)
+        r.ci_90_low, r.ci_90_high = r.var_95, float(np.percentile(final_values, 95))
+        r.ci_95_low, r.ci_95_high = np.percentile(final_values, [2.5, 97.5])
     
+    @profiler.profile('PortfolioMonteCarlo.display_results')
     def display_results(self):
         """显示模拟结果"""
+        r = self.results
         print("\n" + "="*50)
         print("蒙特卡罗模拟结果汇总")
         print("="*50)
@@ -108,33 +288,35 @@ class PortfolioMonteCarlo:
         print(f"模拟次数: {self.num_simulations:,} 次")
         
         print(f"\n--- 最终价值统计 ---")
-        print(f"平均最终价值: {self.mean_final:,.2f} 元")
-        print(f"中位数最终价值: {self.median_final:,.2f} 元")
-        print(f"标准差: {self.std_final:,.2f} 元")
-        print(f"最小值: {self.min_final:,.2f} 元")
-        print(f"最大值: {self.max_final:,.2f} 元")
+        print(f"平均最终价值: {r.mean_final:,.2f} 元")
+        print(f"中位数最终价值: {r.median_final:,.2f} 元")
+        print(f"标准差: {r.std_final:,.2f} 元")
+        print(f"最小值: {r.min_final:,.2f} 元")
+        print(f"最大值: {r.max_final:,.2f} 元")
         
         print(f"\n--- 收益率分析 ---")
-        print(f"平均总收益率: {self.mean_return*100:.2f}%")
-        print(f"年化平均收益率: {self.annualized_return*100:.2f}%")
+        print(f"平均总收益率: {r.mean_return*100:.2f}%")
+        print(f"年化平均收益率: {r.annualized_return*100:.2f}%")
         
         print(f"\n--- 风险评估 ---")
-        print(f"亏损概率: {self.prob_loss*100:.2f}%")
-        print(f"95% VaR (最坏情况): {self.var_95:,.2f} 元")
-        print(f"99% VaR (极端情况): {self.var_99:,.2f} 元")
+        print(f"亏损概率: {r.prob_loss*100:.2f}%")
+        print(f"95% VaR (最坏情况): {r.var_95:,.2f} 元")
+        print(f"99% VaR (极端情况): {r.var_99:,.2f} 元")
         
         print(f"\n--- 置信区间 ---")
-        print(f"90% 置信区间: [{self.ci_90_low:,.2f}, {self.ci_90_high:,.2f}] 元")
-        print(f"95% 置信区间: [{self.ci_95_low:,.2f}, {self.ci_95_high:,.2f}] 元")
+        print(f"90% 置信区间: [{r.ci_90_low:,.2f}, {r.ci_90_high:,.2f}] 元")
+        print(f"95% 置信区间: [{r.ci_95_low:,.2f}, {r.ci_95_high:,.2f}] 元")
     
+    @profiler.profile('PortfolioMonteCarlo.create_visualizations')
     def create_visualizations(self):
         """创建可视化图表"""
+        r = self.results
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         fig.suptitle(f'投资组合蒙特卡罗模拟分析 ({self.num_simulations:,}次模拟)', fontsize=16, fontweight='bold')
         
         # 1. 最终价值分布直方图
-        axes[0, 0].hist(self.final_values, bins=50, alpha=0.7, color='skyblue', edgecolor='black')
-        axes[0, 0].axvline(self.mean_final, color='red', linestyle='--', linewidth=2, label=f'平均值: {self.mean_final:,.0f}元')
+        axes[0, 0].hist(r.final_values, bins=50, alpha=0.7, color='skyblue', edgecolor='black')
+        axes[0, 0].axvline(r.mean_final, color='red', linestyle='--', linewidth=2, label=f'平均值: {r.mean_final:,.0f}元')
         axes[0, 0].axvline(self.initial_investment, color='green', linestyle='--', linewidth=2, label=f'初始投资: {self.initial_investment:,.0f}元')
         axes[0, 0].set_xlabel('最终价值 (元)')
         axes[0, 0].set_ylabel('频数')
@@ -143,27 +325,30 @@ class PortfolioMonteCarlo:
         axes[0, 0].grid(True, alpha=0.3)
         
         # 2. 随机路径样本
-        sample_paths = self.all_paths[:100]  # 只显示前100条路径
-        years = range(self.years + 1)
-        for i in range(min(100, self.num_simulations)):
-            axes[0, 1].plot(years, sample_paths[i], alpha=0.1, color='blue')
-        
-        # 计算平均路径
-        mean_path = np.mean(self.all_paths, axis=0)
-        axes[0, 1].plot(years, mean_path, color='red', linewidth=3, label='平均路径')
-        axes[0, 1].axhline(self.initial_investment, color='green', linestyle='--', label='初始投资')
+        if r.paths is not None:
+            sample_paths = r.paths[:100]  # 只显示前100条路径
+            years = range(self.years + 1)
+            for i in range(min(100, self.num_simulations)):
+                axes[0, 1].plot(years, sample_paths[i], alpha=0.1, color='blue')
+            
+            # 计算平均路径
+            mean_path = np.mean(r.paths, axis=0, dtype=np.float64)
+            axes[0, 1].plot(years, mean_path, color='red', linewidth=3, label='平均路径')
+            axes[0, 1].axhline(self.initial_investment, color='green', linestyle='--', label='初始投资')
+            axes[0, 1].legend()
+        else:
+            axes[0, 1].text(0.5, 0.5, '未保存模拟路径', ha='center', va='center', transform=axes[0, 1].transAxes)
         axes[0, 1].set_xlabel('投资年限')
         axes[0, 1].set_ylabel('投资价值 (元)')
         axes[0, 1].set_title('随机投资路径样本')
-        axes[0, 1].legend()
         axes[0, 1].grid(True, alpha=0.3)
         
         # 3. 累积分布函数
-        sorted_values = np.sort(self.final_values)
+        sorted_values = np.sort(r.final_values)
         cdf = np.arange(1, len(sorted_values) + 1) / len(sorted_values)
         axes[1, 0].plot(sorted_values, cdf, linewidth=2, color='purple')
-        axes[1, 0].axvline(self.var_95, color='orange', linestyle='--', label=f'95% VaR: {self.var_95:,.0f}元')
-        axes[1, 0].axvline(self.var_99, color='red', linestyle='--', label=f'99% VaR: {self.var_99:,.0f}元')
+        axes[1, 0].axvline(r.var_95, color='orange', linestyle='--', label=f'95% VaR: {r.var_95:,.0f}元')
+        axes[1, 0].axvline(r.var_99, color='red', linestyle='--', label=f'99% VaR: {r.var_99:,.0f}元')
         axes[1, 0].set_xlabel('最终价值 (元)')
         axes[1, 0].set_ylabel('累积概率')
         axes[1, 0].set_title('累积分布函数 (CDF)')
@@ -171,7 +356,7 @@ class PortfolioMonteCarlo:
         axes[1, 0].grid(True, alpha=0.3)
         
         # 4. 箱线图
-        axes[1, 1].boxplot(self.final_values, vert=True, patch_artist=True,
+        axes[1, 1].boxplot(r.final_values, vert=True, patch_artist=True,
                           boxprops=dict(facecolor='lightblue', color='blue'),
                           medianprops=dict(color='red'))
         axes[1, 1].set_ylabel('最终价值 (元)')
@@ -183,7 +368,7 @@ class PortfolioMonteCarlo:
         
         # 额外创建一个收益分布图
         plt.figure(figsize=(10, 6))
-        returns = (self.final_values - self.initial_investment) / self.initial_investment * 100
+        returns = (r.final_values - self.initial_investment) / self.initial_investment * 100
         plt.hist(returns, bins=50, alpha=0.7, color='lightgreen', edgecolor='black')
         plt.axvline(0, color='red', linestyle='--', linewidth=2, label='盈亏平衡点')
         plt.axvline(np.mean(returns), color='blue', linestyle='--', linewidth=2, 
@@ -195,34 +380,31 @@ class PortfolioMonteCarlo:
         plt.grid(True, alpha=0.3)
         plt.show()
     
+    @profiler.profile('PortfolioMonteCarlo.sensitivity_analysis')
     def sensitivity_analysis(self):
         """敏感性分析：改变关键参数看结果变化"""
         print("\n正在执行敏感性分析...")
         
         # 测试不同的波动率
-        volatilities = [self.volatility * 0.5, self.volatility, self.volatility * 1.5]
-        vol_results = []
+        volatilities = np.array([self.volatility * 0.5, self.volatility, self.volatility * 1.5])
+        vol_results = np.zeros(len(volatilities), dtype=SENSITIVITY_DTYPE)
         
-        for vol in volatilities:
+        for k, vol in enumerate(volatilities):
             # 简化模拟：只运行1000次快速测试
-            temp_final_values = []
-            for _ in range(1000):
-                random_returns = np.random.normal(
-                    self.annual_return - 0.5 * vol**2, 
-                    vol, 
-                    self.years
-                )
-                final_value = self.initial_investment
-                for ret in random_returns:
-                    final_value *= np.exp(ret)
-                temp_final_values.append(final_value)
+            random_returns = np.random.normal(
+                self.annual_return - 0.5 * vol**2, 
+                vol, 
+                (1000, self.years)
+            )
+            temp_final_values = self.initial_investment * np.exp(random_returns.sum(axis=1))
             
-            vol_results.append({
-                'volatility': vol * 100,
-                'mean_value': np.mean(temp_final_values),
-                'std_value': np.std(temp_final_values),
-                'prob_loss': np.sum(np.array(temp_final_values) < self.initial_investment) / 1000
-            })
+            vol_results[k] = (
+                vol * 100,
+                np.mean(temp_final_values),
+                np.std(temp_final_values),
+                np.sum(temp_final_values < self.initial_investment) / 1000
+            )
+        self.sensitivity_results = vol_results
         
         # 显示敏感性分析结果
         print("\n--- 波动率敏感性分析 ---")
@@ -0,0 +1,142 @@
+#资本成本流水线——CAPM回归估计Beta → 股权成本与WACC → 批量DCF估值
+#整个股票池一次性向量化计算：Re = Rf + Beta * (Rm - Rf)，WACC = E/V * Re + D/V * Rd * (1 - t)
+#Beta估计结果按输入数据内容缓存（内存，可选磁盘），只改DCF参数重跑时不会重新回归
+import hashlib
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from dcf_engine import value_companies
+from profiling import profiler
+
+
+@dataclass(slots=True)
+class BetaEstimates:
+    """CAPM回归结果，每个数组长度为股票数"""
+    betas: np.ndarray
+    alphas: np.ndarray
+    r_squared: np.ndarray
+
+
+@dataclass(slots=True)
+class CostOfCapital:
+    """每家公司的股权成本、税后债务成本、股权权重与WACC"""
+    cost_of_equity: np.ndarray
+    after_tax_cost_of_debt: np.ndarray
+    equity_weight: np.ndarray
+    wacc: np.ndarray
+
+
+def estimate_betas(stock_returns, market_returns):
+    """对股票池做一元线性回归 R_i = alpha + beta * R_m
+
+    stock_returns: (天数, 股票数) 的收益率矩阵，一维时视为单只股票
+    market_returns: (天数,) 的市场收益率
+    """
+    Y = np.asarray(stock_returns, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    X = np.asarray(market_returns, dtype=float)
+    if X.shape[0] != Y.shape[0]:
+        raise ValueError("股票收益率与市场收益率的天数不一致")
+
+    x_dev = X - X.mean()
+    y_dev = Y - Y.mean(axis=0)
+    betas = x_dev @ y_dev / (x_dev @ x_dev)
+    alphas = Y.mean(axis=0) - betas * X.mean()
+    ss_res = np.sum((y_dev - np.outer(x_dev, betas)) ** 2, axis=0)
+    ss_tot = np.sum(y_dev ** 2, axis=0)
+    return BetaEstimates(betas=betas, alphas=alphas, r_squared=1 - ss_res / ss_tot)
+
+
+def compute_wacc(betas, risk_free_rate, market_return, cost_of_debt=0.0, tax_rate=0.0,
+                 equity_value=1.0, debt_value=0.0):
+    """由Beta和资本结构计算每家公司的股权成本与WACC，参数均可为标量或 (n,)"""
+    betas = np.atleast_1d(np.asarray(betas, dtype=float))
+    cost_of_equity = risk_free_rate + betas * (np.asarray(market_return) - risk_free_rate)
+    after_tax_cost_of_debt = np.asarray(cost_of_debt, dtype=float) * (1 - np.asarray(tax_rate, dtype=float))
+    equity_value = np.asarray(equity_value, dtype=float)
+    equity_weight = equity_value / (equity_value + np.asarray(debt_value, dtype=float))
+    wacc = equity_weight * cost_of_equity + (1 - equity_weight) * after_tax_cost_of_debt
+    n = wacc.shape
+    return CostOfCapital(
+        cost_of_equity=np.broadcast_to(cost_of_equity, n),
+        after_tax_cost_of_debt=np.broadcast_to(after_tax_cost_of_debt, n),
+        equity_weight=np.broadcast_to(equity_weight, n),
+        wacc=wacc,
+    )
+
+
+def _fingerprint(*arrays):
+    """按数组内容生成缓存键"""
+    digest = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(a, dtype=float)
+        digest.update(str(a.shape).encode())
+        digest.update(a.tobytes())
+    return digest.hexdigest()
+
+
+class ValuationPipeline:
+    """CAPM → WACC → DCF 三阶段流水线，回归结果按收益率数据缓存"""
+
+    def __init__(self, cache_dir=None):
+        # cache_dir 不为空时，Beta估计结果同时以npz保存到磁盘，跨进程复用
+        self.cache_dir = cache_dir
+        self._beta_cache = {}
+        self.estimates = None
+        self.cost_of_capital = None
+        self.valuation = None
+
+    def estimate(self, stock_returns, market_returns):
+        """第一阶段：估计Beta（命中缓存时直接返回）"""
+        key = _fingerprint(stock_returns, market_returns)
+        if key in self._beta_cache:
+            self.estimates = self._beta_cache[key]
+            return self.estimates
+
+        path = os.path.join(self.cache_dir, f'betas_{key}.npz') if self.cache_dir else None
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                estimates = BetaEstimates(data['betas'], data['alphas'], data['r_squared'])
+        else:
+            with profiler.stage('pipeline.estimate_betas'):
+                estimates = estimate_betas(stock_returns, market_returns)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(path, betas=estimates.betas, alphas=estimates.alphas,
+                         r_squared=estimates.r_squared)
+
+        self._beta_cache[key] = estimates
+        self.estimates = estimates
+        return estimates
+
+    def compute_cost_of_capital(self, risk_free_rate, market_return, cost_of_debt=0.0,
+                                tax_rate=0.0, equity_value=1.0, debt_value=0.0):
+        """第二阶段：用已估计的Beta计算股权成本与WACC"""
+        if self.estimates is None:
+            raise RuntimeError("请先调用 estimate() 估计Beta")
+        with profiler.stage('pipeline.wacc'):
+            self.cost_of_capital = compute_wacc(
+                self.estimates.betas, risk_free_rate, market_return,
+                cost_of_debt, tax_rate, equity_value, debt_value
+            )
+        return self.cost_of_capital
+
+    def value(self, base_fcf, growth_rates, terminal_growth=None, **dcf_options):
+        """第三阶段：以各公司WACC做批量DCF估值，dcf_options 透传给 value_companies"""
+        if self.cost_of_capital is None:
+            raise RuntimeError("请先调用 compute_cost_of_capital() 计算WACC")
+        with profiler.stage('pipeline.dcf'):
+            self.valuation = value_companies(
+                base_fcf, growth_rates, self.cost_of_capital.wacc, terminal_growth, **dcf_options
+            )
+        return self.valuation
+
+    def run(self, stock_returns, market_returns, capital, base_fcf, growth_rates,
+            terminal_growth=None, **dcf_options):
+        """依次执行三个阶段；capital 为 compute_cost_of_capital 的参数字典"""
+        self.estimate(stock_returns, market_returns)
+        self.compute_cost_of_capital(**capital)
+        return self.value(base_fcf, growth_rates, terminal_growth, **dcf_options)
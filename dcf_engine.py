@@ -0,0 +1,187 @@
+#通用DCF估值引擎——任意长度多阶段预测、年中折现、戈登增长/EBITDA退出倍数终值
+#所有公司、所有预测年份一次性用数组计算：增长用cumprod，折现用折现因子向量广播
+#行代表公司，列代表预测年份；标量参数会自动广播到每家公司
+import numpy as np
+from dataclasses import dataclass
+
+from profiling import profiler
+
+TERMINAL_METHODS = ('gordon', 'exit_multiple')
+
+
+@dataclass(slots=True)
+class DCFValuation:
+    """批量DCF估值结果，二维数组形状为 (公司数, 预测年数)"""
+    years: np.ndarray
+    growth_rates: np.ndarray
+    fcf: np.ndarray
+    discount_factors: np.ndarray
+    pv_fcf: np.ndarray
+    terminal_value: np.ndarray
+    pv_terminal: np.ndarray
+    equity_value: np.ndarray
+    enterprise_value: np.ndarray
+    value_per_share: np.ndarray
+
+    @property
+    def pv_forecast(self):
+        """详细预测期现金流现值之和"""
+        return self.pv_fcf.sum(axis=1)
+
+
+def _column(x):
+    """把标量或一维数组转为列向量 (n, 1)"""
+    return np.atleast_1d(np.asarray(x, dtype=float)).reshape(-1, 1)
+
+
+def growth_schedule(stages, n_firms=None):
+    """由多阶段增长假设生成增长率矩阵 (n_firms, 总预测年数)
+
+    stages 为 [(年数, 增长率), ...] 或 [(年数, 起始增长率, 结束增长率), ...]，
+    后者在该阶段内线性过渡；增长率可以是标量，也可以是长度为 n_firms 的数组
+    n_firms 不指定时由各阶段中最长的增长率数组推断，全为标量时为1
+    """
+    lengths = {_column(rate).shape[0] for stage in stages for rate in stage[1:]}
+    if n_firms is None:
+        n_firms = max(lengths, default=1)
+    if not lengths <= {1, n_firms}:
+        raise ValueError(f"各阶段增长率数组长度应为1或公司数 {n_firms}，实际为 {sorted(lengths)}")
+    blocks = []
+    for stage in stages:
+        years = int(stage[0])
+        if years <= 0:
+            raise ValueError("每个阶段的年数必须为正整数")
+        if len(stage) == 2:
+            block = np.broadcast_to(_column(stage[1]), (n_firms, years))
+        elif len(stage) == 3:
+            start, end = _column(stage[1]), _column(stage[2])
+            step = np.arange(1, years + 1) / years
+            block = np.broadcast_to(start + (end - start) * step, (n_firms, years))
+        else:
+            raise ValueError("阶段格式应为 (年数, 增长率) 或 (年数, 起始增长率, 结束增长率)")
+        blocks.append(block)
+    return np.concatenate(blocks, axis=1)
+
+
+def project_cash_flows(base_fcf, growth_rates):
+    """按增长率矩阵复利推算每年现金流：base * cumprod(1 + g)"""
+    return _column(base_fcf) * np.cumprod(1 + np.atleast_2d(growth_rates), axis=1)
+
+
+def discount_factors(wacc, n_years, mid_year=False):
+    """折现因子矩阵 (n, n_years)；mid_year=True 时现金流视为年中发生，指数为 t - 0.5"""
+    t = np.arange(1, n_years + 1) - (0.5 if mid_year else 0.0)
+    return (1 + _column(wacc)) ** -t
+
+
+def value_companies(base_fcf, growth_rates, wacc, terminal_growth=None, *,
+                    terminal_method='gordon', current_ebitda=None, exit_multiple=None,
+                    ebitda_growth=None, mid_year=False, net_debt=0.0, shares=None,
+                    base_year=0):
+    """批量DCF估值
+
+    base_fcf: 当前年度自由现金流，标量或 (n,)
+    growth_rates: 各预测年增长率，(T,) 为所有公司共用，(n, T) 为逐公司设定，可由 growth_schedule 生成
+    wacc / terminal_growth / net_debt / shares: 标量或 (n,)
+    terminal_method: 'gordon' 用 TV = FCF_T * (1 + g) / (WACC - g)，g >= WACC 的公司终值记为 nan；
+                     'exit_multiple' 用 TV = EBITDA_T * 退出倍数，EBITDA 默认按现金流增长率增长
+    mid_year: 预测期现金流按年中折现，终值仍在第T年末折现
+    base_year: 基准年份，第一预测年为 base_year + 1
+    """
+    if terminal_method not in TERMINAL_METHODS:
+        raise ValueError(f"终值算法应为 {TERMINAL_METHODS} 之一")
+
+    growth = np.atleast_2d(np.asarray(growth_rates, dtype=float))
+    if growth.shape[1] == 0:
+        raise ValueError("详细预测期至少为1年")
+    columns = [_column(base_fcf), _column(wacc), _column(net_debt)]
+    if shares is not None:
+        columns.append(_column(shares))
+    if terminal_method == 'gordon':
+        if terminal_growth is None:
+            raise ValueError("戈登增长模型需要提供长期增长率 terminal_growth")
+        columns.append(_column(terminal_growth))
+    else:
+        if current_ebitda is None or exit_multiple is None:
+            raise ValueError("退出倍数法需要提供 current_ebitda 和 exit_multiple")
+        columns += [_column(current_ebitda), _column(exit_multiple)]
+        if ebitda_growth is not None:
+            ebitda_growth = np.atleast_2d(np.asarray(ebitda_growth, dtype=float))
+            columns.append(ebitda_growth)
+    n_firms = np.broadcast_shapes(growth.shape[:1], *(c.shape[:1] for c in columns))[0]
+    n_years = growth.shape[1]
+    growth = np.broadcast_to(growth, (n_firms, n_years))
+    if ebitda_growth is None:
+        ebitda_growth = growth
+    else:
+        ebitda_growth = np.broadcast_to(ebitda_growth, (n_firms, n_years))
+    wacc = np.broadcast_to(_column(wacc), (n_firms, 1))
+
+    with profiler.stage('dcf_engine.projection'):
+        fcf = project_cash_flows(np.broadcast_to(_column(base_fcf), (n_firms, 1)), growth)
+
+    with profiler.stage('dcf_engine.discounting'):
+        factors = discount_factors(wacc, n_years, mid_year)
+        pv_fcf = fcf * factors
+
+    with profiler.stage('dcf_engine.terminal_value'):
+        if terminal_method == 'gordon':
+            g = _column(terminal_growth)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                terminal_value = np.where(g < wacc, fcf[:, -1:] * (1 + g) / (wacc - g), np.nan)
+        else:
+            terminal_ebitda = _column(current_ebitda) * np.prod(1 + ebitda_growth, axis=1, keepdims=True)
+            terminal_value = np.broadcast_to(terminal_ebitda * _column(exit_multiple), (n_firms, 1))
+        pv_terminal = terminal_value / (1 + wacc) ** n_years
+
+    with profiler.stage('dcf_engine.aggregation'):
+        equity_value = pv_fcf.sum(axis=1) + pv_terminal[:, 0]
+        enterprise_value = equity_value + np.broadcast_to(_column(net_debt), (n_firms, 1))[:, 0]
+        if shares is None:
+            value_per_share = np.full(n_firms, np.nan)
+        else:
+            value_per_share = equity_value / np.broadcast_to(_column(shares), (n_firms, 1))[:, 0]
+
+    return DCFValuation(
+        years=np.arange(base_year + 1, base_year + 1 + n_years),
+        growth_rates=growth,
+        fcf=fcf,
+        discount_factors=factors,
+        pv_fcf=pv_fcf,
+        terminal_value=terminal_value[:, 0],
+        pv_terminal=pv_terminal[:, 0],
+        equity_value=equity_value,
+        enterprise_value=enterprise_value,
+        value_per_share=value_per_share,
+    )
+
+
+if __name__ == "__main__":
+    # 简单自检：逐公司的股本与退出倍数应按公司广播，多阶段增长可推断公司数，预测期为0年时应报错
+    g = [0.1, 0.08, 0.06, 0.05, 0.04]
+    result = value_companies(100, g, 0.09, 0.03, shares=np.array([1., 2.]))
+    assert result.value_per_share.shape == (2,)
+    assert np.isclose(result.value_per_share[0], 2 * result.value_per_share[1])
+
+    result = value_companies(100, g, 0.09, terminal_method='exit_multiple', current_ebitda=200,
+                             exit_multiple=np.array([6., 8., 10.]), ebitda_growth=np.zeros((3, 5)),
+                             shares=np.array([1., 2., 4.]))
+    assert np.allclose(result.terminal_value, [1200, 1600, 2000])
+    assert result.value_per_share.shape == (3,)
+
+    schedule = growth_schedule([(5, np.array([0.1, 0.2])), (3, 0.05, 0.03)])
+    assert schedule.shape == (2, 8)
+    try:
+        growth_schedule([(5, np.array([0.1, 0.2])), (3, np.array([0.1, 0.2, 0.3]))])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("各阶段公司数不一致时应报错")
+
+    try:
+        value_companies(100, [], 0.09, 0.03)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("预测期为0年时应报错")
+    print("dcf_engine 自检通过")
@@ -0,0 +1,214 @@
+#性能分析工具——分阶段计时与可选的内存追踪（tracemalloc）
+#用法：设置环境变量 FM_PROFILE=1 后正常运行任一模型脚本，结束时自动输出结果
+#  FM_PROFILE_MEMORY=1          同时记录每个阶段的内存增量与峰值
+#  FM_PROFILE_FORMAT=json|chrome 输出格式，chrome 格式可在 chrome://tracing 或 Perfetto 中打开
+#  FM_PROFILE_OUTPUT=路径        输出文件路径（默认 profile.json / profile.trace.json）
+#未开启时 stage() 返回共享的空上下文，装饰器直接调用原函数，开销几乎为零
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import warnings
+from contextlib import nullcontext
+
+_NULL_STAGE = nullcontext()
+OUTPUT_FORMATS = ('json', 'chrome')
+
+
+class _Stage:
+    """单个计时阶段的上下文管理器"""
+
+    __slots__ = ('profiler', 'name', 'start', 'mem_start', 'peak')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # 把到目前为止的峰值记到外层阶段，再为本阶段重新统计峰值
+            if profiler._stack:
+                outer = profiler._stack[-1]
+                outer.peak = max(outer.peak, peak)
+            tracemalloc.reset_peak()
+            self.mem_start = current
+            self.peak = current
+        profiler._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        profiler = self.profiler
+        profiler._stack.pop()
+        record = {
+            'name': self.name,
+            'start_us': (self.start - profiler._origin) * 1e6,
+            'duration_ms': (end - self.start) * 1e3,
+            'depth': len(profiler._stack),
+        }
+        if profiler.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            record['memory_delta_kb'] = (current - self.mem_start) / 1024
+            record['memory_peak_kb'] = (self.peak - self.mem_start) / 1024
+            if profiler._stack:
+                outer = profiler._stack[-1]
+                outer.peak = max(outer.peak, self.peak)
+            tracemalloc.reset_peak()
+        profiler.records.append(record)
+        return False
+
+
+class Profiler:
+    """收集各模型阶段耗时（及内存）并输出为JSON或Chrome trace"""
+
+    def __init__(self, enabled=False, track_memory=False, output_format='json'):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        self.enabled = False
+        self.track_memory = False
+        self.output_format = output_format
+        self._started_tracing = False
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        if enabled:
+            self.enable(track_memory)
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建分析器"""
+        enabled = os.environ.get('FM_PROFILE', '').lower() in ('1', 'true', 'yes', 'on')
+        track_memory = os.environ.get('FM_PROFILE_MEMORY', '').lower() in ('1', 'true', 'yes', 'on')
+        output_format = os.environ.get('FM_PROFILE_FORMAT', 'json').lower()
+        if output_format not in OUTPUT_FORMATS:
+            # 在运行开始时就提示，避免跑完才发现结果无法保存
+            warnings.warn(f"FM_PROFILE_FORMAT={output_format} 不受支持，已改用 json（可选: {', '.join(OUTPUT_FORMATS)}）")
+            output_format = 'json'
+        return cls(enabled=enabled, track_memory=track_memory, output_format=output_format)
+
+    def enable(self, track_memory=False):
+        """开启计时，track_memory=True 时同时开启tracemalloc"""
+        self.enabled = True
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def disable(self):
+        """关闭计时与内存追踪"""
+        self.enabled = False
+        # 只停止由本分析器开启的tracemalloc，不影响外部已开启的追踪
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+        self.track_memory = False
+
+    def reset(self):
+        """清空已记录的结果"""
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    def stage(self, name):
+        """计时上下文管理器：with profiler.stage('名称'): ..."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def profile(self, name=None):
+        """计时装饰器，默认以函数的限定名作为阶段名"""
+        def decorator(func):
+            stage_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Stage(self, stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """按阶段名汇总：调用次数、总耗时、最大耗时（及最大内存峰值）"""
+        totals = {}
+        for record in self.records:
+            item = totals.setdefault(record['name'], {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            item['calls'] += 1
+            item['total_ms'] += record['duration_ms']
+            item['max_ms'] = max(item['max_ms'], record['duration_ms'])
+            if 'memory_peak_kb' in record:
+                item['max_peak_kb'] = max(item.get('max_peak_kb', 0.0), record['memory_peak_kb'])
+        return totals
+
+    def to_json(self):
+        """结构化的JSON结果"""
+        return {
+            'track_memory': self.track_memory,
+            'stages': list(self.records),
+            'summary': self.summary(),
+        }
+
+    def to_chrome_trace(self):
+        """Chrome trace事件格式（完整事件 ph='X'，时间单位为微秒）"""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = []
+        for record in self.records:
+            args = {k: v for k, v in record.items() if k.startswith('memory_')}
+            events.append({
+                'name': record['name'],
+                'ph': 'X',
+                'ts': record['start_us'],
+                'dur': record['duration_ms'] * 1e3,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path=None, fmt=None):
+        """保存结果，fmt 为 'json' 或 'chrome'，默认使用创建时指定的格式"""
+        fmt = fmt or self.output_format
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}")
+        if path is None:
+            path = 'profile.trace.json' if fmt == 'chrome' else 'profile.json'
+        data = self.to_chrome_trace() if fmt == 'chrome' else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
+
+    def report(self):
+        """在终端打印各阶段耗时汇总"""
+        print("\n--- 性能分析（各阶段耗时）---")
+        for name, item in self.summary().items():
+            line = f"{name}: {item['total_ms']:.2f} ms ({item['calls']}次)"
+            if 'max_peak_kb' in item:
+                line += f", 内存峰值 {item['max_peak_kb']:.1f} KB"
+            print(line)
+
+
+profiler = Profiler.from_env()
+
+
+def _dump_at_exit():
+    if not profiler.enabled or not profiler.records:
+        return
+    profiler.report()
+    try:
+        path = profiler.save(os.environ.get('FM_PROFILE_OUTPUT') or None)
+    except OSError as e:
+        print(f"性能分析结果保存失败: {e}")
+        return
+    print(f"性能分析结果已保存至 {path}")
+
+
+atexit.register(_dump_at_exit)